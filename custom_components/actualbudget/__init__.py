@@ -1,20 +1,35 @@
 """The actualbudget integration."""
 
 from __future__ import annotations
+import asyncio
 import logging
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import (HomeAssistant)
+from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers.typing import ConfigType
 
 from .const import (
     DOMAIN,
+    CONFIG_ENDPOINT,
+    CONFIG_PASSWORD,
+    CONFIG_FILE,
+    CONFIG_CERT,
+    CONFIG_SKIP_VALIDATE_CERT,
+    CONFIG_ENCRYPT_PASSWORD,
+    CONFIG_AKAHU_APP_ID,
+    CONFIG_AKAHU_AUTH_TOKEN,
 )
+from .actualbudget import ActualBudget
 from .actions import register_actions
+from .coordinator import (
+    ActualBudgetAccountsCoordinator,
+    ActualBudgetBudgetsCoordinator,
+    ActualBudgetData,
+)
 
 __version__ = "1.1.0"
 _LOGGER = logging.getLogger(__name__)
-_LOGGER.setLevel(logging.DEBUG)
 
 PLATFORMS: list[str] = ["sensor"]
 
@@ -32,10 +47,60 @@ async def async_setup(hass: HomeAssistant, config: ConfigType):
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up the component from a config entry."""
+    # One client and its coordinators per config entry, shared by all platforms and actions
+    if entry.entry_id not in hass.data[DOMAIN]:
+        api = create_api(hass, entry)
+        accounts = ActualBudgetAccountsCoordinator(hass, entry, api)
+        budgets = ActualBudgetBudgetsCoordinator(hass, entry, api)
+        # Queue the unique id, accounts and budgets together, entities are added with this data
+        results = await asyncio.gather(
+            api.get_unique_id(),
+            accounts.async_config_entry_first_refresh(),
+            budgets.async_config_entry_first_refresh(),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                # Setup is retried later with a new client
+                await api.async_close()
+                if isinstance(result, ConfigEntryNotReady):
+                    raise result
+                raise ConfigEntryNotReady(f"Error connecting to Actual: {result}") from result
+        hass.data[DOMAIN][entry.entry_id] = ActualBudgetData(
+            api, accounts, budgets, results[0]
+        )
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
+async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Unload a config entry."""
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok and (data := hass.data[DOMAIN].pop(entry.entry_id, None)):
+        await data.api.async_close()
+    return unload_ok
+
+
+def create_api(hass: HomeAssistant, entry: ConfigEntry) -> ActualBudget:
+    """Create the ActualBudget client for a config entry."""
+    config = entry.data
+    endpoint = config[CONFIG_ENDPOINT]
+    password = config[CONFIG_PASSWORD]
+    file = config[CONFIG_FILE]
+    cert = config.get(CONFIG_CERT)
+    skip_validate_cert = config[CONFIG_SKIP_VALIDATE_CERT]
+    akahu_app_id = config.get(CONFIG_AKAHU_APP_ID)
+    akahu_auth_token = config.get(CONFIG_AKAHU_AUTH_TOKEN)
+    if akahu_auth_token and not akahu_auth_token.lower().startswith("bearer "):
+        _LOGGER.debug("missing bearer, appending it")
+        akahu_auth_token = "Bearer "+akahu_auth_token 
+    if not skip_validate_cert:
+        cert = False
+    encrypt_password = config.get(CONFIG_ENCRYPT_PASSWORD)
+    return ActualBudget(hass, endpoint, password, file, cert, encrypt_password,akahu_app_id, akahu_auth_token)
+
+
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Reload config entry."""
     await async_setup_entry(hass, entry)
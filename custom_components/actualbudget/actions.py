@@ -12,10 +12,8 @@ from homeassistant.core import (
 )
 from homeassistant.config_entries import ConfigEntry, ConfigEntryState
 from homeassistant.exceptions import ServiceValidationError
-from homeassistant.helpers.entity_registry import (async_entries_for_config_entry, async_get)
-from homeassistant.helpers.entity_component import async_update_entity
 
-from .actualbudget import ActualBudget
+from .coordinator import ActualBudgetData
 
 from .const import (
     DOMAIN,
@@ -27,20 +25,31 @@ from .const import (
 
 __version__ = "1.1.0"
 _LOGGER = logging.getLogger(__name__)
-_LOGGER.setLevel(logging.DEBUG)
+
+SERVICE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): str,
+    }
+)
+AKAHU_SERVICE_SCHEMA = SERVICE_SCHEMA.extend(
+    {
+        vol.Optional(AKAHU_SYNC_DAYS, default="20"): str,
+        vol.Optional(AKAHU_SYNC_CATEGORIES, default=False): bool,
+    }
+)
 
 
 @callback
-def get_actualbudget_client(
+def get_actualbudget_data(
     hass: HomeAssistant, config_entry_id: str
-) -> ActualBudget:
-    """Get the Music Assistant client for the given config entry."""
+) -> ActualBudgetData:
+    """Get the ActualBudget client and coordinators for the given config entry."""
     entry: ConfigEntry | None
     if not (entry := hass.config_entries.async_get_entry(config_entry_id)):
         raise ServiceValidationError("Entry not found")
     if entry.state is not ConfigEntryState.LOADED:
         raise ServiceValidationError("Entry not loaded")
-    return entry.api
+    return hass.data[DOMAIN][entry.entry_id]
 
 
 @callback
@@ -50,93 +59,52 @@ def register_actions(hass: HomeAssistant) -> None:
         DOMAIN,
         "bank_sync",
         handle_bank_sync,
-        schema=vol.Schema(
-            {
-                vol.Required(ATTR_CONFIG_ENTRY_ID): str,
-            }
-        )
+        schema=SERVICE_SCHEMA,
     )
     hass.services.async_register(
         DOMAIN,
         "budget_sync",
         handle_budget_sync,
-        schema=vol.Schema(
-            {
-                vol.Required(ATTR_CONFIG_ENTRY_ID): str,
-            }
-        )
+        schema=SERVICE_SCHEMA,
     )
     hass.services.async_register(
         DOMAIN,
         "akahu_bank_sync",
         handle_akahu_bank_sync,
-        schema=vol.Schema(
-            {
-                vol.Required(ATTR_CONFIG_ENTRY_ID): str,
-                vol.Optional(AKAHU_SYNC_DAYS, default="20"): str,
-                vol.Optional(AKAHU_SYNC_CATEGORIES,default=False): bool,
-            }
-        )
+        schema=AKAHU_SERVICE_SCHEMA,
     )
 
 
+async def async_refresh_coordinators(data: ActualBudgetData) -> None:
+    """Refresh the accounts and budgets of the config entry's sensors."""
+    await asyncio.gather(data.accounts.async_refresh(), data.budgets.async_refresh())
+
+
 @callback
 async def handle_bank_sync(call: ServiceCall) -> ServiceResponse:
     """Handle the bank_sync service action call."""
-    api = get_actualbudget_client(call.hass, call.data[ATTR_CONFIG_ENTRY_ID])
-
-    await api.run_bank_sync()
-
-    entity_registry = async_get(call.hass)
+    data = get_actualbudget_data(call.hass, call.data[ATTR_CONFIG_ENTRY_ID])
 
-    # Update all account and budget entities
-    integration_entities = async_entries_for_config_entry(
-        entity_registry, call.data[ATTR_CONFIG_ENTRY_ID])
+    await data.api.run_bank_sync()
 
-    tasks = [
-        async_update_entity(call.hass, entity.entity_id) for entity in integration_entities
-    ]
-
-    if tasks:
-        await asyncio.gather(*tasks)
+    await async_refresh_coordinators(data)
 
 
 @callback
 async def handle_budget_sync(call: ServiceCall) -> ServiceResponse:
     """Handle the budget_sync service action call."""
-    api = get_actualbudget_client(call.hass, call.data[ATTR_CONFIG_ENTRY_ID])
-
-    await api.run_budget_sync()
-
-    entity_registry = async_get(call.hass)
+    data = get_actualbudget_data(call.hass, call.data[ATTR_CONFIG_ENTRY_ID])
 
-    # Update all account and budget entities
-    integration_entities = async_entries_for_config_entry(
-        entity_registry, call.data[ATTR_CONFIG_ENTRY_ID])
+    await data.api.run_budget_sync()
 
-    tasks = [
-        async_update_entity(call.hass, entity.entity_id) for entity in integration_entities
-    ]
+    await async_refresh_coordinators(data)
 
-    if tasks:
-        await asyncio.gather(*tasks)
 
 @callback
 async def handle_akahu_bank_sync(call: ServiceCall) -> ServiceResponse:
     """Handle the akahu_bank_sync service action call."""
-    api = get_actualbudget_client(call.hass, call.data[ATTR_CONFIG_ENTRY_ID])
-
-    await api.run_akahu_bank_sync(call.data[AKAHU_SYNC_DAYS],call.data[AKAHU_SYNC_CATEGORIES])
-
-    entity_registry = async_get(call.hass)
-
-    # Update all account and budget entities
-    integration_entities = async_entries_for_config_entry(
-        entity_registry, call.data[ATTR_CONFIG_ENTRY_ID])
+    data = get_actualbudget_data(call.hass, call.data[ATTR_CONFIG_ENTRY_ID])
 
-    tasks = [
-        async_update_entity(call.hass, entity.entity_id) for entity in integration_entities
-    ]
+    await data.api.run_akahu_bank_sync(call.data[AKAHU_SYNC_DAYS],call.data[AKAHU_SYNC_CATEGORIES])
 
-    if tasks:
-        await asyncio.gather(*tasks)
+    await async_refresh_coordinators(data)
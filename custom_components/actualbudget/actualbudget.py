@@ -1,13 +1,16 @@
 """API to ActualBudget."""
 
+import asyncio
 import pathlib
 from decimal import Decimal
 import logging
 import requests
 import json
 import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Any, Dict, List, Tuple
 from actual import Actual
 from actual.exceptions import (
     UnknownFileId,
@@ -15,32 +18,54 @@ from actual.exceptions import (
     InvalidZipFile,
     AuthorizationError,
 )
-from actual.queries import get_accounts, get_account, get_budgets, get_category, create_transaction, get_or_create_account,match_transaction, get_ruleset
+from actual.database import Accounts, Categories, Transactions
+from actual.queries import get_budgets, get_or_create_category, create_transaction, get_or_create_account, get_ruleset
+from actual.utils.conversions import cents_to_decimal
+from sqlalchemy import func
+from sqlmodel import select
+from homeassistant.util.json import json_loads
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ConnectionError, SSLError
+from urllib3.util.retry import Retry
 import datetime
-import threading
-from functools import partial
+import time
 
 _LOGGER = logging.getLogger(__name__)
-_LOGGER.setLevel(logging.DEBUG)
 
-SESSION_TIMEOUT = datetime.timedelta(minutes=30)
-
-
-@dataclass
+# Session timeout in seconds
+SESSION_TIMEOUT = 1800.0
+# Time in seconds during which a validated session is reused without validating again
+VALIDATE_INTERVAL = 60.0
+# Minimum time in seconds between two syncs with the server
+SYNC_MIN_INTERVAL = 10.0
+# Time in seconds during which fetched accounts and budgets are reused
+CACHE_TTL = 30.0
+# Timeout in seconds for Akahu API requests
+AKAHU_TIMEOUT = 30
+# Maximum number of Akahu accounts fetched concurrently
+AKAHU_MAX_WORKERS = 8
+# Days before the newest synced Akahu transaction that are fetched again,
+# so transactions that settle late are still picked up
+AKAHU_SYNC_OVERLAP = datetime.timedelta(days=7)
+
+_HUNDRED = Decimal(100)
+_TRAILING_DIGITS_RE = re.compile(r'\d{3,}$')
+
+
+@dataclass(slots=True, frozen=True)
 class BudgetAmount:
     month: str
-    amount: float | None
+    amount: Decimal | None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Budget:
     name: str
-    amounts: List[BudgetAmount]
+    amounts: Tuple[BudgetAmount, ...]
     balance: Decimal
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Account:
     name: str | None
     balance: Decimal
@@ -58,32 +83,73 @@ class ActualBudget:
         self.encrypt_password = encrypt_password
         self.actual = None
         self.file_id = None
-        self.sessionStartedAt = datetime.datetime.now()
-        self._lock = threading.Lock()
+        self._data_dir = pathlib.Path(hass.config.path("actualbudget"))
+        self.sessionStartedAt = time.monotonic()
+        self._last_validated = 0.0
+        self._last_sync_at = 0.0
+        self._dirty = False
+        self._lock = asyncio.Lock()
+        # The Actual session is not thread safe, all its work runs on this single thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="actualbudget")
         self.akahu_app_id = akahu_app_id
         self.akahu_auth_token = akahu_auth_token
+        self._http: requests.Session | None = None
+        self._akahu_state: Dict[str, Dict[str, str]] | None = None
+        self._accounts_cache: Tuple[float, Tuple[Account, ...], Dict[str, Account]] | None = None
+        self._budgets_cache: Tuple[float, Tuple[Budget, ...], Dict[str, Budget]] | None = None
+
+    async def async_run(self, target, *args):
+        """Run a job on the client's own worker thread, one job at a time."""
+        async with self._lock:  # Ensure only one job runs at a time
+            return await self.hass.loop.run_in_executor(self._executor, target, *args)
+
+    async def async_close(self):
+        """Close the session and HTTP connections, then release the worker thread."""
+        try:
+            # Queued behind any running job, so nothing is using the session anymore
+            await self.async_run(self.close_sync)
+        finally:
+            self._executor.shutdown(wait=False)
+
+    def close_sync(self):
+        if self.actual:
+            try:
+                self.actual.__exit__(None, None, None)
+            except Exception as e:
+                _LOGGER.error("Error closing session: %s", e)
+            self.actual = None
+        if self._http is not None:
+            self._http.close()
+            self._http = None
 
     async def get_unique_id(self):
         """Gets a unique id for the sensor based on the remote `file_id`."""
-        return await self.hass.async_add_executor_job(self.get_unique_id_sync)
+        return await self.async_run(self.get_unique_id_sync)
 
     def get_unique_id_sync(self):
         self.get_session()
         return self.file_id
         
-    def get_session(self):
-        """Get Actual session if it exists, or create a new one safely."""
+    def get_session(self, sync: bool = True):
+        """Get Actual session if it exists, or create a new one safely.
+
+        Pass ``sync=False`` when the caller syncs the budget itself right after.
+        """
         # Invalidate session if it is too old        
         if (
             self.actual
-            and self.sessionStartedAt + SESSION_TIMEOUT < datetime.datetime.now()
+            and time.monotonic() - self.sessionStartedAt > SESSION_TIMEOUT
         ):            
             try:
                 self.actual.__exit__(None, None, None)
             except Exception as e:
                 _LOGGER.error("Error closing session: %s", e)
             self.actual = None
-        
+
+        # Skip validation if the session was validated recently
+        if self.actual and time.monotonic() - self._last_validated < VALIDATE_INTERVAL:
+            return self.actual.session
+
         # Validate existing session
         if self.actual:
             try:
@@ -91,7 +157,9 @@ class ActualBudget:
                 if not result.data.validated:
                     raise Exception("Session not validated")
                 # sync local database
-                self.actual.sync()
+                if sync:
+                    self.maybe_sync()
+                self._last_validated = time.monotonic()
             except Exception as e:
                 _LOGGER.error("Error validating session: %s", e)
                 self.actual = None
@@ -100,10 +168,46 @@ class ActualBudget:
         if not self.actual:
         
             self.actual =  self.create_session()
-            self.sessionStartedAt = datetime.datetime.now()
+            self.sessionStartedAt = time.monotonic()
+            self._last_validated = self.sessionStartedAt
+            # A new session starts from a freshly downloaded and synced budget
+            self._last_sync_at = self.sessionStartedAt
+            self._dirty = False
 
         return self.actual.session  # Return session after lock is released
 
+    def sync(self):
+        """Sync the local budget with the server."""
+        self.actual.sync()
+        self._last_sync_at = time.monotonic()
+
+    def maybe_sync(self):
+        """Sync the local budget with the server, unless it was synced moments ago."""
+        if not self._dirty and time.monotonic() - self._last_sync_at < SYNC_MIN_INTERVAL:
+            return
+        self.sync()
+
+    def mark_dirty(self):
+        """Flag local changes that still need to be committed."""
+        self._dirty = True
+
+    def commit(self):
+        """Send local changes to the server, if there are any."""
+        if not self._dirty:
+            return
+        self.actual.commit()
+        self._dirty = False
+        self.invalidate_data_cache()
+
+    def invalidate_data_cache(self):
+        """Drop the cached accounts and budgets."""
+        self._accounts_cache = None
+        self._budgets_cache = None
+
+    def invalidate_session_cache(self):
+        """Force the next get_session() call to validate and sync the session."""
+        self._last_validated = 0.0
+
     def create_session(self):        
         _LOGGER.debug("Creating session: url=%s p=*** cert=%s encrypt= %s file=%s",self.endpoint,self.cert,self.encrypt_password,self.file)
         actual = Actual(
@@ -116,303 +220,478 @@ class ActualBudget:
         
         
         self.file_id = str(actual._file.file_id)
-        actual._data_dir = (
-            pathlib.Path(self.hass.config.path("actualbudget")) / f"{self.file_id}"
-        )
+        actual._data_dir = self._data_dir / self.file_id
         actual.__enter__()
         result = actual.validate()
         if not result.data.validated:
             raise Exception("Session not validated")
         return actual
 
-    async def get_accounts(self) -> List[Account]:
+    async def get_accounts(self) -> Tuple[Account, ...]:
         """Get accounts."""
-        return await self.hass.async_add_executor_job(self.get_accounts_sync)
-
-    def get_accounts_sync(self) -> List[Account]:
-        with self._lock:  # Ensure only one thread enters at a time
-            session = self.get_session()
-            accounts = get_accounts(session)
-            return [Account(name=a.name, balance=a.balance) for a in accounts]
+        return await self.async_run(self.get_accounts_sync)
+
+    def get_accounts_sync(self) -> Tuple[Account, ...]:
+        return self.get_cached_accounts()[1]
+
+    def get_cached_accounts(self) -> Tuple[float, Tuple[Account, ...], Dict[str, Account]]:
+        """Get all accounts and the same accounts keyed by name, cached for a short time."""
+        now = time.monotonic()
+        if self._accounts_cache is None or now - self._accounts_cache[0] > CACHE_TTL:
+            accounts = tuple(self.fetch_accounts())
+            self._accounts_cache = (
+                now,
+                accounts,
+                {account.name: account for account in accounts},
+            )
+        return self._accounts_cache
+
+    def fetch_accounts(self) -> List[Account]:
+        session = self.get_session()
+        # get_accounts() eagerly loads every transaction of every account and
+        # `balance` runs one query per account, only the sums are needed here
+        accounts = session.exec(
+            select(Accounts.id, Accounts.name).filter(
+                func.coalesce(Accounts.tombstone, 0) == 0
+            )
+        ).all()
+        account_balances = self.get_account_balances(session)
+        return [
+            Account(name=name, balance=account_balances.get(account_id, Decimal(0)))
+            for account_id, name in accounts
+        ]
+
+    def get_account_balances(self, session) -> Dict[str, Decimal]:
+        """Get the balance of every account, keyed by account id, in a single query."""
+        rows = session.exec(
+            select(Transactions.acct, func.coalesce(func.sum(Transactions.amount), 0))
+            .filter(
+                Transactions.is_parent == 0,
+                Transactions.tombstone == 0,
+            )
+            .group_by(Transactions.acct)
+        ).all()
+        return {account_id: cents_to_decimal(amount) for account_id, amount in rows}
 
     async def get_account(self, account_name) -> Account:
-        return await self.hass.async_add_executor_job(
-            self.get_account_sync,
-            account_name,
-        )
+        return await self.async_run(self.get_account_sync, account_name)
 
     def get_account_sync(
         self,
         account_name,
     ) -> Account:
-        with self._lock:  # Ensure only one thread enters at a time
-            session = self.get_session()
-            account = get_account(session, account_name)
-            if not account:
-                raise Exception(f"Account {account_name} not found")
-            return Account(name=account.name, balance=account.balance)
-
-    async def get_budgets(self) -> List[Budget]:
+        account = self.get_cached_accounts()[2].get(account_name)
+        if not account:
+            raise Exception(f"Account {account_name} not found")
+        return account
+
+    async def get_budgets(self) -> Tuple[Budget, ...]:
         """Get budgets."""
-        return await self.hass.async_add_executor_job(self.get_budgets_sync)
-
-    def get_budgets_sync(self) -> List[Budget]:
-        with self._lock:  # Ensure only one thread enters at a time
-            session = self.get_session()
-            budgets_raw = get_budgets(session)
-            budgets: Dict[str, Budget] = {}
-            for budget_raw in budgets_raw:
-                if not budget_raw.category:
-                    continue
-                category = str(budget_raw.category.name)
-                amount = (
-                    None if not budget_raw.amount else (float(budget_raw.amount) / 100)
+        return await self.async_run(self.get_budgets_sync)
+
+    def get_budgets_sync(self) -> Tuple[Budget, ...]:
+        return self.get_cached_budgets()[1]
+
+    def get_cached_budgets(self) -> Tuple[float, Tuple[Budget, ...], Dict[str, Budget]]:
+        """Get all budgets and the same budgets keyed by name, cached for a short time."""
+        now = time.monotonic()
+        if self._budgets_cache is None or now - self._budgets_cache[0] > CACHE_TTL:
+            budgets = tuple(self.fetch_budgets())
+            self._budgets_cache = (
+                now,
+                budgets,
+                {budget.name: budget for budget in budgets},
+            )
+        return self._budgets_cache
+
+    def fetch_budgets(self) -> List[Budget]:
+        session = self.get_session()
+        budgets_raw = get_budgets(session)
+        amounts_by_category: Dict[str, List[BudgetAmount]] = defaultdict(list)
+        for budget_raw in budgets_raw:
+            if not budget_raw.category:
+                continue
+            amounts_by_category[str(budget_raw.category.name)].append(
+                BudgetAmount(
+                    month=str(budget_raw.month),
+                    amount=(
+                        None if not budget_raw.amount else (Decimal(budget_raw.amount) / _HUNDRED)
+                    ),
                 )
-                month = str(budget_raw.month)
-                if category not in budgets:
-                    budgets[category] = Budget(
-                        name=category, amounts=[], balance=Decimal(0)
-                    )
-                budgets[category].amounts.append(
-                    BudgetAmount(month=month, amount=amount)
-                )
-            for category in budgets:
-                budgets[category].amounts = sorted(
-                    budgets[category].amounts, key=lambda x: x.month
-                )
-                category_data = get_category(session, category)
-                budgets[category].balance = (
-                    category_data.balance if category_data else Decimal(0)
-                )
-            return list(budgets.values())
+            )
+        # Fetch all category balances at once instead of one query per category
+        category_balances = self.get_category_balances(
+            session, amounts_by_category.keys()
+        )
+        # get_budgets() returns the rows ordered by month, so the amounts are already sorted
+        return [
+            Budget(
+                name=category,
+                amounts=tuple(amounts),
+                balance=category_balances.get(category, Decimal(0)),
+            )
+            for category, amounts in amounts_by_category.items()
+        ]
+
+    def get_category_balances(self, session, category_names) -> Dict[str, Decimal]:
+        """Get the balance of each of the given categories in a single query."""
+        rows = session.exec(
+            select(Categories.name, func.coalesce(func.sum(Transactions.amount), 0))
+            .join(Transactions, Transactions.category_id == Categories.id)
+            .filter(
+                Categories.name.in_(list(category_names)),
+                Categories.tombstone == 0,
+                Transactions.is_parent == 0,
+                Transactions.tombstone == 0,
+            )
+            .group_by(Categories.name)
+        ).all()
+        return {name: cents_to_decimal(amount) for name, amount in rows}
 
     async def get_budget(self, budget_name) -> Budget:
-        return await self.hass.async_add_executor_job(
-            self.get_budget_sync,
-            budget_name,
-        )
+        return await self.async_run(self.get_budget_sync, budget_name)
 
     def get_budget_sync(
         self,
         budget_name,
     ) -> Budget:
-        with self._lock:  # Ensure only one thread enters at a time
-            session = self.get_session()
-            budgets_raw = get_budgets(session, None, budget_name)
-            if not budgets_raw or not budgets_raw[0]:
-                raise Exception(f"budget {budget_name} not found")
-            budget: Budget = Budget(
-                name=budget_name, amounts=[], balance=Decimal(0))
-            for budget_raw in budgets_raw:
-                amount = (
-                    None if not budget_raw.amount else (float(budget_raw.amount) / 100)
-                )
-                month = str(budget_raw.month)
-                budget.amounts.append(BudgetAmount(month=month, amount=amount))
-            budget.amounts = sorted(budget.amounts, key=lambda x: x.month)
-            category_data = get_category(session, budget_name)
-            budget.balance = category_data.balance if category_data else Decimal(
-                0)
-            return budget
+        budget = self.get_cached_budgets()[2].get(budget_name)
+        if not budget:
+            raise Exception(f"budget {budget_name} not found")
+        return budget
 
     async def run_bank_sync(self) -> None:
         """Run bank synchronization."""
-        return await self.hass.async_add_executor_job(self.run_bank_sync_sync)
+        return await self.async_run(self.run_bank_sync_sync)
     
     def run_bank_sync_sync(self) -> None:
-        with self._lock:  # Ensure only one thread enters at a time
-            self.get_session()
-
-            self.actual.sync()
-            self.actual.run_bank_sync()
-            self.actual.commit()
+        self.invalidate_session_cache()
+        self.get_session(sync=False)
+        self.maybe_sync()
+        self.actual.run_bank_sync()
+        self.mark_dirty()
+        self.commit()
 
     async def run_akahu_bank_sync(self, sync_days, sync_categories) -> None:
         """Run Akahu bank synchronization."""
-        return await self.hass.async_add_executor_job(partial(self.run_akahu_bank_sync_sync,sync_days,sync_categories))
+        if not self.is_akahu_configured():
+            _LOGGER.debug("Akahu not configured, skipping")
+            return
+        return await self.async_run(self.run_akahu_bank_sync_sync, sync_days, sync_categories)
 
-    def cleanup_meta(self, checkstring) -> str:
+    def is_akahu_configured(self) -> bool:
+        """Check whether Akahu credentials were provided."""
+        return bool(self.akahu_app_id and self.akahu_auth_token)
+
+    def cleanup_meta(self, checkstring) -> str | None:
+        checkstring_lower = checkstring.lower()
         # exclude cdn web/image links
-        if "cdn." in  checkstring.lower():
-            return ""
+        if "cdn." in checkstring_lower:
+            return None
         #ignore any akahu meta data
-        if "akahu" in  checkstring.lower():
-            return ""        
+        if "akahu" in checkstring_lower:
+            return None
         return checkstring
     
+    def summarize_meta(self, fields) -> str | None:
+        """Join the useful values of an Akahu merchant/meta object."""
+        if not fields:
+            return None
+        # We don't care about the _id, but want the rest
+        return "  ".join(filter(None, (
+            self.cleanup_meta(str(value)) for key, value in fields.items() if key != "_id"
+        ))) or None
+
+    def get_akahu_http(self) -> requests.Session:
+        """Get the pooled HTTP session used for the Akahu API."""
+        if self._http is None:
+            self._http = requests.Session()
+            self._http.headers.update(
+                {
+                    "accept": "application/json",
+                    "authorization": self.akahu_auth_token,
+                    "X-Akahu-Id": self.akahu_app_id
+                }
+            )
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=16,
+                max_retries=Retry(
+                    total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504]
+                ),
+            )
+            self._http.mount("https://", adapter)
+        return self._http
+
+    def get_akahu_state_path(self) -> pathlib.Path:
+        return self._data_dir / f"akahu_{self.file_id}.json"
+
+    def load_akahu_state(self) -> Dict[str, Dict[str, str]]:
+        """Load the per account Akahu sync state of the budget file."""
+        if self._akahu_state is None:
+            try:
+                self._akahu_state = json.loads(self.get_akahu_state_path().read_text())
+            except FileNotFoundError:
+                self._akahu_state = {}
+            except (OSError, ValueError) as e:
+                _LOGGER.warning("Could not read Akahu sync state: %s", e)
+                self._akahu_state = {}
+        return self._akahu_state
+
+    def save_akahu_state(self) -> None:
+        """Store the per account Akahu sync state of the budget file."""
+        try:
+            path = self.get_akahu_state_path()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(self._akahu_state))
+        except OSError as e:
+            _LOGGER.warning("Could not write Akahu sync state: %s", e)
+
+    def get_akahu_start(self, account_id, startdate) -> str:
+        """Skip the part of the sync window that was already synced for the account."""
+        last_date = self.load_akahu_state().get(account_id, {}).get("last_date")
+        if not startdate or not last_date:
+            return startdate
+        resume_date = (
+            datetime.datetime.fromisoformat(last_date) - AKAHU_SYNC_OVERLAP
+        ).isoformat()
+        return max(startdate, resume_date)
+
+    def fetch_akahu_transactions(self, http, account_id, startdate) -> tuple[list, int]:
+        """Fetch all transaction pages of an Akahu account."""
+        # Url template for transactions for that account
+        url = f"https://api.akahu.io/v1/accounts/{account_id}/transactions"
+        queryParams = {"start": startdate} if startdate else {}
+        #if not enddate =="":   queryParams["end"] =enddate  # don't think we ever need this
+
+        # Start with no cursor
+        trans_cursor = None
+        trans_cursor_count = 0
+        transactions = []
+
+        # While cursor is not null, keep iterating
+        while True:
+            if (trans_cursor):   queryParams["cursor"] =trans_cursor
+            #  Get the transactions for that account, passing through the query parameters above (including cursor if needed)
+            transresponse = http.get(url, params=queryParams, timeout=AKAHU_TIMEOUT)
+            transjson_obj = json_loads(transresponse.content)
+            trans_cursor = transjson_obj["cursor"]["next"]
+            transactions.extend(transjson_obj["items"])
+
+            # This will get us out of the While True loop!
+            trans_cursor_count = trans_cursor_count+1
+            # Akahu returns a null cursor on the last page
+            if not trans_cursor:
+                return transactions, trans_cursor_count
+
     def run_akahu_bank_sync_sync(self, sync_days, sync_categories) -> None:
-        headers = {
-            "accept": "application/json",
-            "authorization": self.akahu_auth_token,
-            "X-Akahu-Id": self.akahu_app_id
-        }
+        if not self.is_akahu_configured():
+            _LOGGER.debug("Akahu not configured, skipping")
+            return
+        http = self.get_akahu_http()
         _LOGGER.debug("run_akahu_bank_sync_sync - Syncing: %s Days, Categories: %s",sync_days, sync_categories) 
-        with self._lock:  # Ensure only one thread enters at a time
-            session = self.get_session()
-            ruleset = get_ruleset(session)
-            #self.actual.sync()
-            # Start by getting a list of accounts
-            url = "https://api.akahu.io/v1/accounts"
-
-            response = requests.get(url, headers=headers)
-            #Should prob do some response handling here, but for now this should log the response code. i.e. 200,401 etc
-            _LOGGER.debug("response: %s",response)
-            json_object = json.loads(response.text)
+        self.invalidate_session_cache()
+        session = self.get_session()
+        ruleset = get_ruleset(session)
+        #self.actual.sync()
+        # Start by getting a list of accounts
+        url = "https://api.akahu.io/v1/accounts"
+
+        response = http.get(url, timeout=AKAHU_TIMEOUT)
+        #Should prob do some response handling here, but for now this should log the response code. i.e. 200,401 etc
+        _LOGGER.debug("response: %s",response)
+        json_object = json_loads(response.content)
 
             
-            # For each account in Akahu
-            # We will loop over every account, then get every transaction for that account
-            for account in json_object["items"]:
-                account_name = account["name"]
-                account_id = account["_id"]
-
-                # Check if account exists in Actual, if not, create
-                act = get_or_create_account(session, account_name)
-                
-                # Url template for transactions for that account
-                url = "https://api.akahu.io/v1/accounts/"+account_id+"/transactions"
-            
-                # Default to last 20 days
-                startdate = (datetime.datetime.now() - datetime.timedelta(days = 20)).isoformat()
-                if(sync_days):
-                    if(sync_days.lower() == "all"):
-                        startdate =""
-                    else:
-                        try:
-                            int_sync_days = int(sync_days)
-                            startdate = (datetime.datetime.now() - datetime.timedelta(days = int_sync_days)).isoformat()
-                        except ValueError:
-                            _LOGGER.warning("Could not parse Akahu Sync days (%s) - defaulting to 20", sync_days)                
-                
-                # Start with no cursor
-                trans_cursor = None 
-                trans_total_count = 0
-                trans_imported_count = 0
-                trans_cursor_count = 0
-
-                # While cursor is not null, keep iterating        
-                while True:            
-                    queryParams = {}
-                    if not startdate =="":  queryParams["start"] =startdate
-                    #if not enddate =="":   queryParams["end"] =enddate  # don't think we ever need this 
-                    if (trans_cursor):   queryParams["cursor"] =trans_cursor
-                    #  Get the transactions for that account, passing through the query parameters above (including cursor if needed)
-                    transresponse = requests.get(url,headers=headers,params=queryParams)
-                    transjson_obj = json.loads(transresponse.text)
-                    trans_cursor = transjson_obj["cursor"]["next"]
-
-                    # For each transaction returned, we're going to match or create in Actual
-                    for transaction in transjson_obj["items"]:
-                        trans_id = transaction["_id"]
-                        trans_date = datetime.datetime.strptime(transaction["date"], "%Y-%m-%dT%H:%M:%S.%f%z").astimezone().date()
-                        trans_desc = transaction["description"]
-                        trans_amount = transaction["amount"]
-                        trans_merchant_summary = None
-                        trans_meta_summary = None
-                        trans_category = None
-                        trans_category_parent = None
-                        trans_total_count = trans_total_count+1
-
-                        # Merchant, Meta and Category are not always there, so check first
-                        if transaction.get("merchant"):
-                            for key, value in transaction["merchant"].items():
-                                # We don't care about the _id, but want the rest
-                                if(key != "_id"):
-                                    merchant_meta = self.cleanup_meta(str(value))      
-                                    if trans_merchant_summary is None:
-                                        trans_merchant_summary = merchant_meta
-                                    else:
-                                        trans_merchant_summary += "  " + merchant_meta                        
-                        if sync_categories:
-                            if transaction.get("category"):                    
-                                # This first one is the specific (often _too_ specific) category name
-                                trans_category = transaction["category"]["name"]
-                                # Below gets the parent category group
-                                category_groups = transaction["category"]["groups"]
-                                group_names = [group["name"] for group in category_groups.values()]                                
-                                trans_category_parent = group_names[0]
+        # Default to last 20 days
+        startdate = (datetime.datetime.now() - datetime.timedelta(days = 20)).isoformat()
+        sync_days_norm = sync_days.strip().lower() if sync_days else None
+        if(sync_days_norm):
+            if(sync_days_norm == "all"):
+                startdate =""
+            else:
+                try:
+                    int_sync_days = int(sync_days_norm)
+                    startdate = (datetime.datetime.now() - datetime.timedelta(days = int_sync_days)).isoformat()
+                except ValueError:
+                    _LOGGER.warning("Could not parse Akahu Sync days (%s) - defaulting to 20", sync_days)
+
+        akahu_state = dict(self.load_akahu_state())
+
+        # Fetch the transactions of every Akahu account concurrently, they are
+        # imported afterwards as the Actual session is not thread safe
+        accounts = json_object["items"]
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(AKAHU_MAX_WORKERS, len(accounts)))
+        ) as executor:
+            fetched = list(
+                executor.map(
+                    lambda account: self.fetch_akahu_transactions(
+                        http,
+                        account["_id"],
+                        self.get_akahu_start(account["_id"], startdate),
+                    ),
+                    accounts,
+                )
+            )
+
+        # Accounts and categories looked up during this sync, so each one is
+        # only queried once and the same objects are reused for every transaction
+        acct_cache: Dict[str, Any] = {}
+        cat_cache: Dict[str, Any] = {}
+
+        # For each account in Akahu
+        # We will loop over every account, then over every transaction for that account
+        for account, (transactions, trans_cursor_count) in zip(accounts, fetched):
+            account_name = account["name"]
+
+            # Remember the newest transaction, the next sync resumes from there
+            if transactions:
+                newest_date = datetime.datetime.fromisoformat(
+                    max(transaction["date"] for transaction in transactions)
+                ).astimezone().date()
+                akahu_state[account["_id"]] = {"last_date": newest_date.isoformat()}
+
+            # Check if account exists in Actual, if not, create
+            if account_name not in acct_cache:
+                acct_cache[account_name] = get_or_create_account(session, account_name)
+                if acct_cache[account_name] in session.new:
+                    self.mark_dirty()
+            act = acct_cache[account_name]
+
+            # Look up the imported ids already in this account at once,
+            # instead of matching each transaction with its own query
+            existing_ids = set(
+                session.exec(
+                    select(Transactions.financial_id).filter(
+                        Transactions.acct == act.id,
+                        Transactions.financial_id.isnot(None),
+                        func.coalesce(Transactions.tombstone, 0) == 0,
+                    )
+                ).all()
+            )
+
+            trans_total_count = 0
+            trans_imported_count = 0
+            created = []
+
+            # For each transaction returned, we're going to create it in Actual if it is new
+            for transaction in transactions:
+                trans_id = transaction["_id"]
+                trans_total_count = trans_total_count+1
+                if trans_id in existing_ids:
+                    continue
+                trans_date = datetime.datetime.fromisoformat(transaction["date"]).astimezone().date()
+                trans_desc = transaction["description"]
+                trans_amount = transaction["amount"]
+                trans_category = None
+                trans_category_parent = None
+
+                # Merchant, Meta and Category are not always there, so check first
+                trans_merchant_summary = self.summarize_meta(transaction.get("merchant"))
+                if sync_categories:
+                    if transaction.get("category"):                    
+                        # This first one is the specific (often _too_ specific) category name
+                        trans_category = transaction["category"]["name"]
+                        # Below gets the parent category group
+                        category_groups = transaction["category"]["groups"]
+                        group_names = [group["name"] for group in category_groups.values()]                                
+                        trans_category_parent = group_names[0]
+                        if trans_category_parent not in cat_cache:
+                            cat_cache[trans_category_parent] = get_or_create_category(
+                                session, trans_category_parent
+                            )
+                        trans_category_parent = cat_cache[trans_category_parent]
                         
-                        if transaction.get("meta"):
-                            for key, value in transaction["meta"].items():
-                                # We don't care about the _id, but want the rest
-                                if(key != "_id"):
-                                    meta_val = self.cleanup_meta(str(value))                      
-                                    if trans_meta_summary is None:
-                                        trans_meta_summary = meta_val
-                                    else:
-                                        trans_meta_summary += "  " + meta_val
-
-                        # Throw all the extra meta data we've gathered into Notes
-                        trans_notes = ""
-                        if(trans_meta_summary):
-                            trans_notes += trans_meta_summary+" "
-                        if(trans_merchant_summary):
-                            trans_notes += trans_merchant_summary+" "
-                        if(trans_category):
-                            trans_notes += trans_category+" "
-                        trans_notes += trans_desc
-
-                        # Strip numbers from the end of the description (Bank seems to like to add them there?)
-                        # Blindly just removing any string that ends with 3 or more numbers
-                        # We still copy the original description into notes above though
-                        trans_desc =  (re.sub(r'\d{3,}$', '', trans_desc)).strip()
+                trans_meta_summary = self.summarize_meta(transaction.get("meta"))
+
+                # Throw all the extra meta data we've gathered into Notes
+                notes_parts = []
+                if(trans_meta_summary):
+                    notes_parts.append(trans_meta_summary)
+                if(trans_merchant_summary):
+                    notes_parts.append(trans_merchant_summary)
+                if(trans_category):
+                    notes_parts.append(trans_category)
+                notes_parts.append(trans_desc)
+                trans_notes = " ".join(notes_parts)
+
+                # Strip numbers from the end of the description (Bank seems to like to add them there?)
+                # Blindly just removing any string that ends with 3 or more numbers
+                # We still copy the original description into notes above though
+                trans_desc = _TRAILING_DIGITS_RE.sub('', trans_desc).strip()
                                 
-                        # Build transaction Params
-                        params = {
-                            "s": session,
-                            "date": trans_date,
-                            "account": account_name,
-                            "imported_id": trans_id,
-                            "payee": trans_desc,
-                            "notes": trans_notes,
-                            "category": trans_category_parent,
-                            "amount": trans_amount,
-                            "cleared": False,
-                        }        
-
-                        # Filter out None values
-                        filtered_params = {k: v for k, v in params.items() if v is not None}
-
-                        # First check for any match on imported_id = trans_id
-                        t = match_transaction(s=session,date=trans_date,account=account_name,imported_id=trans_id)
-
-                        # Only create transactions if there's no match
-                        if(t is None):
-                            t = create_transaction(**filtered_params)   
-                            trans_imported_count = trans_imported_count+1
-                            #_LOGGER.debug("Imported transaction: %s", t)
-                        #else:
-                            # Do some updates here maybe?
-
-
-                        # Apply the Actual ruleset against our transaction
-                        ruleset.run(t)
-
-                    # This will get us out of the While True loop!
-                    trans_cursor_count = trans_cursor_count+1
-                    if not trans_cursor or trans_cursor.lower() == "none":
-                        _LOGGER.info("Account: %s | Total Transactions Processed: %s | New Transactions imported: %s | Pages count: %s",account_name,trans_total_count,trans_imported_count,trans_cursor_count)
-                        break
-            _LOGGER.debug("committing session")
-            self.actual.commit()
+                # Build transaction Params
+                params = {
+                    "s": session,
+                    "date": trans_date,
+                    "account": act,
+                    "imported_id": trans_id,
+                    "payee": trans_desc,
+                    "notes": trans_notes,
+                    "category": trans_category_parent,
+                    "amount": trans_amount,
+                    "cleared": False,
+                }        
+
+                # Filter out None values
+                filtered_params = {k: v for k, v in params.items() if v is not None}
+
+                # Only create transactions that were not imported before
+                t = create_transaction(**filtered_params)
+                existing_ids.add(trans_id)
+                trans_imported_count = trans_imported_count+1
+                created.append(t)
+                self.mark_dirty()
+                #_LOGGER.debug("Imported transaction: %s", t)
+
+            # Apply the Actual ruleset against all new transactions at once
+            if created:
+                ruleset.run(created)
+
+            _LOGGER.info("Account: %s | Total Transactions Processed: %s | New Transactions imported: %s | Pages count: %s",account_name,trans_total_count,trans_imported_count,trans_cursor_count)
+        _LOGGER.debug("committing session")
+        self.commit()
+        self._akahu_state = akahu_state
+        self.save_akahu_state()
     
     async def run_budget_sync(self) -> None:
         """Run bank synchronization."""
-        return await self.hass.async_add_executor_job(self.run_budget_sync_sync)
+        return await self.async_run(self.run_budget_sync_sync)
 
     def run_budget_sync_sync(self) -> None:
-        with self._lock:  # Ensure only one thread enters at a time
-            self.get_session()
-
-            self.actual.sync()
-
-    async def test_connection(self):
-        return await self.hass.async_add_executor_job(self.test_connection_sync)
+        # Pulling from the server is the whole point of this action, so
+        # always sync instead of letting a recent sync skip it
+        self.invalidate_session_cache()
+        self.get_session(sync=False)
+        self.sync()
+        self.invalidate_data_cache()
+
+    @staticmethod
+    async def test_connection(hass, endpoint, password, file, cert, encrypt_password):
+        """Check the connection without creating a full ActualBudget client."""
+        return await hass.async_add_executor_job(
+            ActualBudget.test_connection_sync,
+            endpoint,
+            password,
+            file,
+            cert,
+            encrypt_password,
+        )
 
-    def test_connection_sync(self):
+    @staticmethod
+    def test_connection_sync(endpoint, password, file, cert, encrypt_password):
         try:
-            actualSession = self.get_session()
-            if not actualSession:
+            # Creating the client logs in, resolves the file and validates the
+            # token, without downloading and syncing the budget
+            actual = Actual(
+                base_url=endpoint,
+                password=password,
+                cert=cert,
+                encryption_password=encrypt_password,
+                file=file,
+            )
+            if not actual._file:
                 return "failed_file"
         # except SSLError:
         #     return "failed_ssl"
@@ -24,7 +24,6 @@ from .const import (
 )
 
 _LOGGER = logging.getLogger(__name__)
-_LOGGER.setLevel(logging.DEBUG)
 
 DATA_SCHEMA = vol.Schema(
     {
@@ -67,7 +66,7 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         encrypt_password = user_input.get(CONFIG_ENCRYPT_PASSWORD)
         akahu_app_id = user_input.get(CONFIG_AKAHU_APP_ID)
         akahu_auth_token = user_input.get(CONFIG_AKAHU_AUTH_TOKEN)
-        if not akahu_auth_token.lower().startswith("bearer "):
+        if akahu_auth_token and not akahu_auth_token.lower().startswith("bearer "):
             _LOGGER.debug("missing bearer, appending it")
             akahu_auth_token = "Bearer "+akahu_auth_token 
 
@@ -95,6 +94,7 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             )
 
     async def _test_connection(self, endpoint, password, file, cert, encrypt_password, akahu_app_id, akahu_auth_token):
-        """Return true if gas station exists."""
-        api = ActualBudget(self.hass, endpoint, password, file, cert, encrypt_password, akahu_app_id, akahu_auth_token)
-        return await api.test_connection()
+        """Return an error key if the connection to Actual Budget fails."""
+        return await ActualBudget.test_connection(
+            self.hass, endpoint, password, file, cert, encrypt_password
+        )
@@ -0,0 +1,102 @@
+"""Data update coordinators for the actualbudget integration."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import datetime
+import logging
+
+from typing import Awaitable, Callable, Dict, TypeVar
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .actualbudget import Account, ActualBudget, Budget
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Time between updating data from API
+SCAN_INTERVAL = datetime.timedelta(minutes=60)
+# Longest time between updates while the data does not change
+MAX_SCAN_INTERVAL = datetime.timedelta(hours=4)
+
+_DataT = TypeVar("_DataT")
+
+
+class ActualBudgetCoordinator(DataUpdateCoordinator[_DataT]):
+    """Base coordinator that polls less often while the data does not change."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry,
+        api: ActualBudget,
+        name: str,
+        fetch: Callable[[], Awaitable[_DataT]],
+    ):
+        super().__init__(
+            hass,
+            _LOGGER,
+            config_entry=config_entry,
+            name=name,
+            update_interval=SCAN_INTERVAL,
+        )
+        self.api = api
+        self._fetch = fetch
+
+    async def _async_update_data(self) -> _DataT:
+        data = await self._fetch()
+        # Double the interval while nothing changes, reset it after a change
+        if data == self.data:
+            self.update_interval = min(self.update_interval * 2, MAX_SCAN_INTERVAL)
+        else:
+            self.update_interval = SCAN_INTERVAL
+        return data
+
+
+class ActualBudgetAccountsCoordinator(ActualBudgetCoordinator[Dict[str, Account]]):
+    """Fetch all accounts once per interval for every account sensor."""
+
+    def __init__(
+        self, hass: HomeAssistant, config_entry: ConfigEntry, api: ActualBudget
+    ):
+        super().__init__(
+            hass, config_entry, api, f"{DOMAIN}_accounts", self._async_fetch_accounts
+        )
+
+    async def _async_fetch_accounts(self) -> Dict[str, Account]:
+        try:
+            accounts = await self.api.get_accounts()
+        except Exception as err:
+            raise UpdateFailed(f"Error fetching accounts: {err}") from err
+        return {account.name: account for account in accounts}
+
+
+class ActualBudgetBudgetsCoordinator(ActualBudgetCoordinator[Dict[str, Budget]]):
+    """Fetch all budgets once per interval for every budget sensor."""
+
+    def __init__(
+        self, hass: HomeAssistant, config_entry: ConfigEntry, api: ActualBudget
+    ):
+        super().__init__(
+            hass, config_entry, api, f"{DOMAIN}_budgets", self._async_fetch_budgets
+        )
+
+    async def _async_fetch_budgets(self) -> Dict[str, Budget]:
+        try:
+            budgets = await self.api.get_budgets()
+        except Exception as err:
+            raise UpdateFailed(f"Error fetching budgets: {err}") from err
+        return {budget.name: budget for budget in budgets}
+
+
+@dataclass(slots=True)
+class ActualBudgetData:
+    """The client and coordinators of a config entry."""
+
+    api: ActualBudget
+    accounts: ActualBudgetAccountsCoordinator
+    budgets: ActualBudgetBudgetsCoordinator
+    unique_id: str
@@ -2,10 +2,11 @@
 
 from __future__ import annotations
 
+from bisect import bisect_right
 from decimal import Decimal
 import logging
 
-from typing import List, Dict, Union
+from typing import Dict, Union
 import datetime
 
 from homeassistant.components.sensor import (
@@ -16,31 +17,32 @@ from homeassistant.components.sensor.const import (
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import (
     CONFIG_PREFIX,
     DEFAULT_ICON,
     DOMAIN,
-    CONFIG_ENDPOINT,
-    CONFIG_PASSWORD,
-    CONFIG_FILE,
     CONFIG_UNIT,
-    CONFIG_CERT,
-    CONFIG_ENCRYPT_PASSWORD,
-    CONFIG_SKIP_VALIDATE_CERT,
-    CONFIG_AKAHU_APP_ID,
-    CONFIG_AKAHU_AUTH_TOKEN,
 )
-from .actualbudget import ActualBudget, BudgetAmount
+from .actualbudget import Budget
+from .coordinator import (
+    ActualBudgetAccountsCoordinator,
+    ActualBudgetBudgetsCoordinator,
+    ActualBudgetData,
+)
 
 _LOGGER = logging.getLogger(__name__)
-_LOGGER.setLevel(logging.DEBUG)
 
-# Time between updating data from API
-SCAN_INTERVAL = datetime.timedelta(minutes=60)
-MINIMUM_INTERVAL = datetime.timedelta(minutes=1)
+_ZERO = Decimal(0)
+_CENTS = Decimal("0.01")
+
+
+def _to_float(amount: Decimal | None) -> float | None:
+    """Convert a budget amount to a JSON serializable attribute value."""
+    return None if amount is None else float(amount)
 
 
 async def async_setup_entry(
@@ -50,296 +52,149 @@ async def async_setup_entry(
 ):
     """Setup sensor platform."""
     config = config_entry.data
-    endpoint = config[CONFIG_ENDPOINT]
-    password = config[CONFIG_PASSWORD]
-    file = config[CONFIG_FILE]
-    cert = config.get(CONFIG_CERT)
-    skip_validate_cert = config[CONFIG_SKIP_VALIDATE_CERT]
     unit = config.get(CONFIG_UNIT, "€")
     prefix = config.get(CONFIG_PREFIX)
-    akahu_app_id = config.get(CONFIG_AKAHU_APP_ID)
-    akahu_auth_token = config.get(CONFIG_AKAHU_AUTH_TOKEN)
-    if not akahu_auth_token.lower().startswith("bearer "):
-        _LOGGER.debug("missing bearer, appending it")
-        akahu_auth_token = "Bearer "+akahu_auth_token 
-    if not skip_validate_cert:
-        cert = False
-    encrypt_password = config.get(CONFIG_ENCRYPT_PASSWORD)
-    api = ActualBudget(hass, endpoint, password, file, cert, encrypt_password,akahu_app_id, akahu_auth_token)
-    config_entry.api = api
-    
-    unique_source_id = await api.get_unique_id()
+    data: ActualBudgetData = hass.data[DOMAIN][config_entry.entry_id]
+    accounts_coordinator = data.accounts
+    budgets_coordinator = data.budgets
+    unique_source_id = data.unique_id
 
-    accounts = await api.get_accounts()
-    lastUpdate = datetime.datetime.now()
     accounts = [
         actualbudgetAccountSensor(
-            api,
-            endpoint,
-            password,
-            file,
+            accounts_coordinator,
             unit,
-            cert,
-            encrypt_password,
-            account.name,
-            account.balance,
+            name,
             unique_source_id,
             prefix,
-            lastUpdate,
         )
-        for account in accounts
+        for name in accounts_coordinator.data
     ]
-    async_add_entities(accounts, update_before_add=True)
+    async_add_entities(accounts)
 
-    budgets = await api.get_budgets()
-    lastUpdate = datetime.datetime.now()
     budgets = [
         actualbudgetBudgetSensor(
-            api,
-            endpoint,
-            password,
-            file,
+            budgets_coordinator,
             unit,
-            cert,
-            encrypt_password,
-            budget.name,
-            budget.amounts,
-            budget.balance,
+            name,
             unique_source_id,
             prefix,
-            lastUpdate,
         )
-        for budget in budgets
+        for name in budgets_coordinator.data
     ]
-    async_add_entities(budgets, update_before_add=True)
+    async_add_entities(budgets)
 
 
-class actualbudgetAccountSensor(SensorEntity):
+class actualbudgetAccountSensor(
+    CoordinatorEntity[ActualBudgetAccountsCoordinator], SensorEntity
+):
     """Representation of a actualbudget Sensor."""
 
+    __slots__ = ("_name",)
+
+    _attr_icon = DEFAULT_ICON
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
+
     def __init__(
         self,
-        api: ActualBudget,
-        endpoint: str,
-        password: str,
-        file: str,
+        coordinator: ActualBudgetAccountsCoordinator,
         unit: str,
-        cert: str,
-        encrypt_password: str | None,
         name: str,
-        balance: float,
         unique_source_id: str,
         prefix: str,
-        balance_last_updated: datetime.datetime,
     ):
-        super().__init__()
-        self._api = api
+        super().__init__(coordinator)
         self._name = name
-        self._balance = balance
-        self._unique_source_id = unique_source_id
-        self._endpoint = endpoint
-        self._password = password
-        self._file = file
-        self._cert = cert
-        self._encrypt_password = encrypt_password
-        self._prefix = prefix
-
-        self._icon = DEFAULT_ICON
-        self._unit_of_measurement = unit
-        self._device_class = SensorDeviceClass.MONETARY
-        self._state_class = SensorStateClass.MEASUREMENT
-        self._state = None
-        self._available = True
-        self._balance_last_updated = balance_last_updated
-
-    @property
-    def name(self) -> str:
-        """Return the name of the entity."""
-        if self._prefix:
-            return f"{self._prefix}_{self._name}"
-        else:
-            return self._name
-
-    @property
-    def unique_id(self) -> str:
-        """Return the unique ID of the sensor."""
-        if self._prefix:
-            return (
-                f"{DOMAIN}-{self._unique_source_id}-{self._prefix}-{self._name}".lower()
-            )
+        self._attr_native_value = coordinator.data[name].balance
+        self._attr_native_unit_of_measurement = unit
+        if prefix:
+            self._attr_name = f"{prefix}_{name}"
+            self._attr_unique_id = f"{DOMAIN}-{unique_source_id}-{prefix}-{name}".lower()
         else:
-            return f"{DOMAIN}-{self._unique_source_id}-{self._name}".lower()
+            self._attr_name = name
+            self._attr_unique_id = f"{DOMAIN}-{unique_source_id}-{name}".lower()
 
     @property
     def available(self) -> bool:
         """Return True if entity is available."""
-        return self._available
-
-    @property
-    def state(self) -> float:
-        return self._balance
+        return super().available and self._name in self.coordinator.data
 
-    @property
-    def device_class(self):
-        return self._device_class
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Take the balance of this account from the coordinator data."""
+        if account := self.coordinator.data.get(self._name):
+            self._attr_native_value = account.balance
+        super()._handle_coordinator_update()
 
-    @property
-    def state_class(self):
-        return self._state_class
 
-    @property
-    def unit_of_measurement(self):
-        """Return the unit the value is expressed in."""
-        return self._unit_of_measurement
-
-    @property
-    def icon(self):
-        return self._icon
-
-    async def async_update(self) -> None:
-        if (
-            self._balance_last_updated
-            and datetime.datetime.now() - self._balance_last_updated < MINIMUM_INTERVAL
-        ):
-            return
-        """Fetch new state data for the sensor."""
-        try:
-            api = self._api
-            account = await api.get_account(self._name)
-            if account:
-                self._balance = account.balance
-            self._balance_last_updated = datetime.datetime.now()
-        except Exception as err:
-            self._available = False
-            _LOGGER.exception(
-                "Unknown error updating data from ActualBudget API to account %s. %s",
-                self._name,
-                err,
-            )
+class actualbudgetBudgetSensor(
+    CoordinatorEntity[ActualBudgetBudgetsCoordinator], SensorEntity
+):
+    """Representation of a actualbudget Sensor."""
 
+    __slots__ = ("_name",)
 
-class actualbudgetBudgetSensor(SensorEntity):
-    """Representation of a actualbudget Sensor."""
+    _attr_icon = DEFAULT_ICON
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
 
     def __init__(
         self,
-        api: ActualBudget,
-        endpoint: str,
-        password: str,
-        file: str,
+        coordinator: ActualBudgetBudgetsCoordinator,
         unit: str,
-        cert: str,
-        encrypt_password: str | None,
         name: str,
-        amounts: List[BudgetAmount],
-        balance: float,
         unique_source_id: str,
         prefix: str,
-        balance_last_updated: datetime.datetime,
     ):
-        super().__init__()
-        self._api = api
+        super().__init__(coordinator)
         self._name = name
-        self._amounts = amounts
-        self._balance = balance
-        self._unique_source_id = unique_source_id
-        self._endpoint = endpoint
-        self._password = password
-        self._file = file
-        self._cert = cert
-        self._encrypt_password = encrypt_password
-        self._prefix = prefix
-
-        self._icon = DEFAULT_ICON
-        self._unit_of_measurement = unit
-        self._device_class = SensorDeviceClass.MONETARY
-        self._state_class = SensorStateClass.MEASUREMENT
-        self._available = True
-        self._balance_last_updated = balance_last_updated
-
-    @property
-    def name(self) -> str:
-        """Return the name of the entity."""
-        budgetName = f"budget_{self._name}"
-        if self._prefix:
-            return f"{self._prefix}_{budgetName}"
-        return budgetName
-
-    @property
-    def unique_id(self) -> str:
-        """Return the unique ID of the sensor."""
-        if self._prefix:
-            return f"{DOMAIN}-{self._unique_source_id}-{self._prefix}-budget-{self._name}".lower()
+        self._set_budget(coordinator.data[name])
+        self._attr_native_unit_of_measurement = unit
+        if prefix:
+            self._attr_name = f"{prefix}_budget_{name}"
+            self._attr_unique_id = f"{DOMAIN}-{unique_source_id}-{prefix}-budget-{name}".lower()
         else:
-            return f"{DOMAIN}-{self._unique_source_id}-budget-{self._name}".lower()
+            self._attr_name = f"budget_{name}"
+            self._attr_unique_id = f"{DOMAIN}-{unique_source_id}-budget-{name}".lower()
 
     @property
     def available(self) -> bool:
         """Return True if entity is available."""
-        return self._available
-
-    @property
-    def device_class(self):
-        return self._device_class
-
-    @property
-    def state_class(self):
-        return self._state_class
-
-    @property
-    def unit_of_measurement(self):
-        """Return the unit the value is expressed in."""
-        return self._unit_of_measurement
-
-    @property
-    def icon(self):
-        return self._icon
-
-    @property
-    def state(self) -> float | None:
-        total = 0
-        for amount in self._amounts:
-            if datetime.datetime.strptime(amount.month, '%Y%m') <= datetime.datetime.now():
-                total += amount.amount if amount.amount else 0
-        return round(self._balance + Decimal(total), 2)
-
-    @property
-    def extra_state_attributes(self) -> Dict[str, Union[str, float]]:
-        extra_state_attributes = {}
-        amounts = [amount for amount in self._amounts if datetime.datetime.strptime(
-            amount.month, '%Y%m') <= datetime.datetime.now()]
-        current_month = amounts[-1].month
-        if current_month:
-            extra_state_attributes["current_month"] = current_month
-            extra_state_attributes["current_amount"] = amounts[-1].amount
-        if len(amounts) > 1:
-            extra_state_attributes["previous_month"] = amounts[-2].month
-            extra_state_attributes["previous_amount"] = amounts[-2].amount
-            total = 0
-            for amount in amounts:
-                total += amount.amount if amount.amount else 0
-            extra_state_attributes["total_amount"] = total
-
-        return extra_state_attributes
-
-    async def async_update(self) -> None:
-        if (
-            self._balance_last_updated
-            and datetime.datetime.now() - self._balance_last_updated < MINIMUM_INTERVAL
-        ):
+        return super().available and self._name in self.coordinator.data
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Take the amounts and balance of this budget from the coordinator data."""
+        if budget := self.coordinator.data.get(self._name):
+            self._set_budget(budget)
+        super()._handle_coordinator_update()
+
+    def _set_budget(self, budget: Budget) -> None:
+        """Compute the state and attributes of the budget up to the current month."""
+        amounts = budget.amounts
+        now = datetime.datetime.now()
+        # Budget months are YYYYMM, compare them as integers
+        cutoff = now.year * 100 + now.month
+        # Amounts are sorted by month, which keeps the months bisectable
+        months = tuple(int(amount.month) for amount in amounts)
+        values = tuple(amount.amount or _ZERO for amount in amounts)
+        index = bisect_right(months, cutoff)
+        total = sum(values[:index], _ZERO)
+
+        self._attr_native_value = (budget.balance + total).quantize(_CENTS)
+
+        # Only the last two months up to now are reported
+        recent = amounts[max(index - 2, 0):index]
+        # No months up to now, e.g. a category budgeted only in the future
+        if not recent:
+            self._attr_extra_state_attributes = {}
             return
-        """Fetch new state data for the sensor."""
-        try:
-            api = self._api
-            budget = await api.get_budget(self._name)
-            self._balance_last_updated = datetime.datetime.now()
-            if budget:
-                self._amounts = budget.amounts
-                self._balance = budget.balance
-        except Exception as err:
-            self._available = False
-            _LOGGER.exception(
-                "Unknown error updating data from ActualBudget API to budget %s. %s",
-                self._name,
-                err,
-            )
+        attrs: Dict[str, Union[str, float]] = {
+            "current_month": recent[-1].month,
+            "current_amount": _to_float(recent[-1].amount),
+        }
+        if len(recent) > 1:
+            attrs["previous_month"] = recent[0].month
+            attrs["previous_amount"] = _to_float(recent[0].amount)
+            attrs["total_amount"] = float(total)
+        self._attr_extra_state_attributes = attrs